@@ -1,62 +1,116 @@
 from machine import Pin
+from collections import deque
+from micropython import const
+import micropython
 import time
 
+# Settings (const() lets the compiler inline them)
+THRESHOLD_CM = const(100)       # Detection distance in cm
+COOLDOWN_MS = const(2000)       # Time between detections (ms)
+FULL_COOLDOWN_MS = const(5000)  # Time between entry detections while the room is full (ms)
+MAX_CAP = const(50)             # Maximum room capacity
+MASS_WIN_MS = const(3000)       # Time window for mass event detection (ms)
+MASS_TH = const(3)              # Minimum people for mass event
+# Each sensor is serviced every 2nd pass (it reads its last echo and pings
+# again), so the slowest tier still samples a doorway at least every 300ms
+ACTIVE_SLEEP_MS = const(40)     # Loop delay within 5s of a detection (> echo time)
+IDLE_SLEEP_MS = const(100)      # Loop delay within 60s of a detection
+DORMANT_SLEEP_MS = const(150)   # Loop delay otherwise
+STATS_MS = const(15000)         # Statistics printout interval (ms)
+STALE_MS = const(60000)         # Older timestamps are pulled forward (ticks wrap)
+LOG = const(1)                  # 0 = silent, 1 = print events (0 also skips their formatting)
+
+# Print banners, built once
+_SEP_EQ = "=" * 45
+_SEP_BANG = "!" * 45
+_STATS_HEADER = _SEP_EQ + "\n         STATISTICS\n" + _SEP_EQ
+_PROGRESS = "." * 10 + " [Running]"
+
+# Reserve memory so errors raised inside the echo IRQ can be reported
+micropython.alloc_emergency_exception_buf(100)
+
 # Simple distance simulation for Wokwi
 class UltrasonicSensor:
     """Simplified ultrasonic sensor for Wokwi"""
     
+    __slots__ = ('trigger', 'echo', 'name', '_t_rise', '_t_fall', '_ready')
+    
     def __init__(self, trigger_pin, echo_pin, name="Sensor"):
         self.trigger = Pin(trigger_pin, Pin.OUT)
         self.echo = Pin(echo_pin, Pin.IN)
         self.name = name
+        # Echo edge times, written by the IRQ handler (preallocated: ISRs must not allocate)
+        self._t_rise = 0
+        self._t_fall = 0
+        self._ready = False
         self.trigger.value(0)
+        self.echo.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=self._isr, hard=True)
         print(f"+ {name} initialized (Trigger: GPIO{trigger_pin}, Echo: GPIO{echo_pin})")
     
+    # time functions are bound as default args so the hot paths use
+    # local lookups instead of global + module attribute lookups
+    def _isr(self, pin, _ticks_us=time.ticks_us):
+        """Record echo edge times"""
+        if pin.value():
+            self._t_rise = _ticks_us()
+        else:
+            self._t_fall = _ticks_us()
+            self._ready = True
+    
+    def ping(self, _sleep_us=time.sleep_us):
+        """Send trigger pulse, the echo is captured by the IRQ handler"""
+        self._ready = False
+        trigger = self.trigger.value
+        trigger(0)
+        _sleep_us(2)
+        trigger(1)
+        _sleep_us(10)
+        trigger(0)
+    
+    def distance(self, _ticks_diff=time.ticks_diff):
+        """
+        Distance of the last captured echo in whole cm
+        Returns 400 if no echo is available
+        """
+        if not self._ready:
+            return 400
+        self._ready = False
+        
+        pulse_duration = _ticks_diff(self._t_fall, self._t_rise)
+        if pulse_duration > 30000:
+            return 400  # Return max distance on timeout (30ms)
+        
+        # Speed of sound is 0.0343 cm/us and the echo covers the distance
+        # twice, so cm = us * 343 / 20000 (integer math, whole cm)
+        return pulse_duration * 343 // 20000
+    
     def measure(self):
         """
         Measure distance using ultrasonic sensor
         Returns distance in cm
         """
-        # Send trigger pulse
-        self.trigger.value(0)
-        time.sleep_us(2)
-        self.trigger.value(1)
-        time.sleep_us(10)
-        self.trigger.value(0)
-        
-        # Wait for echo to start
-        timeout = 30000  # 30ms timeout
-        start = time.ticks_us()
-        
-        while self.echo.value() == 0:
-            if time.ticks_diff(time.ticks_us(), start) > timeout:
-                return 400  # Return max distance on timeout
-        
-        # Measure echo pulse
-        pulse_start = time.ticks_us()
-        
-        while self.echo.value() == 1:
-            if time.ticks_diff(time.ticks_us(), pulse_start) > timeout:
-                return 400
-        
-        pulse_end = time.ticks_us()
-        pulse_duration = time.ticks_diff(pulse_end, pulse_start)
-        
-        # Calculate distance: duration * speed of sound / 2
-        # Speed of sound = 343 m/s = 0.0343 cm/μs
-        distance = (pulse_duration * 0.0343) / 2
-        
-        return distance
+        self.ping()
+        time.sleep_ms(35)  # Longer than the 30ms echo timeout
+        return self.distance()
 
 
 class PeopleCounter:
     """People counting system for Wokwi"""
     
+    __slots__ = (
+        'entry_sensor', 'exit_sensor', 'led_entry', 'led_exit',
+        'entries', 'exits', 'inside',
+        'last_entry_time', 'last_exit_time', '_now', '_last_event_ts',
+        'recent_entries', 'recent_exits', '_recent_entry_count', '_recent_exit_count',
+        '_oldest_entry', '_oldest_exit',
+        'room_occupied_alert_active', '_led_timers',
+    )
+    
     def __init__(self):
-        print("\n" + "="*45)
+        print("\n" + _SEP_EQ)
         print("   ULTRASONIC PEOPLE COUNTER")
         print("   Wokwi Simulator Version")
-        print("="*45)
+        print(_SEP_EQ)
         print("\nInitializing system...")
         
         # Create sensors
@@ -75,89 +129,120 @@ class PeopleCounter:
             self.led_entry = None
             self.led_exit = None
         
-        # Settings
-        self.threshold = 100  # Detection distance in cm
-        self.cooldown = 2.0   # Seconds between detections
-        self.max_capacity = 50  # Maximum room capacity
-        self.mass_event_window = 3.0  # Time window for mass event detection (seconds)
-        self.mass_event_threshold = 3  # Minimum people for mass event
-        
         # Counters
         self.entries = 0
         self.exits = 0
         self.inside = 0
         
         # Timing
-        self.last_entry_time = 0
-        self.last_exit_time = 0
+        # time.ticks_ms() values, compared with time.ticks_diff()
+        long_ago = time.ticks_add(time.ticks_ms(), -STALE_MS)
+        self.last_entry_time = long_ago
+        self.last_exit_time = long_ago
+        self._now = time.ticks_ms()  # Cached once per loop pass
+        self._last_event_ts = long_ago  # Last time someone was detected
         
         # Mass event tracking
-        self.recent_entries = []  # List of entry timestamps
-        self.recent_exits = []  # List of exit timestamps
+        # MicroPython deques need an empty iterable and a maxlen; timestamps
+        # are appended in order, so expired ones are always at the left.
+        # The oldest one is held outside its deque: peeking at dq[0] needs
+        # MicroPython 1.23+, and the bundled micropython_esp32.bin is 1.21
+        self.recent_entries = deque((), 16)  # Entry timestamps after the oldest
+        self.recent_exits = deque((), 16)  # Exit timestamps after the oldest
+        self._recent_entry_count = 0  # Including the oldest
+        self._recent_exit_count = 0
+        self._oldest_entry = 0  # Valid while the count is non-zero
+        self._oldest_exit = 0
         
         # Alert state
         self.room_occupied_alert_active = False
+        self._led_timers = {}  # LED -> [toggles left, next toggle tick, period ms]
         
-        print(f"+ Threshold: {self.threshold}cm")
-        print(f"+ Cooldown: {self.cooldown}s")
-        print(f"+ Max Capacity: {self.max_capacity} people")
-        print(f"+ Mass Event Threshold: {self.mass_event_threshold} people in {self.mass_event_window}s")
-        print("\n" + "="*45)
+        print(f"+ Threshold: {THRESHOLD_CM}cm")
+        print(f"+ Cooldown: {COOLDOWN_MS // 1000}s")
+        print(f"+ Max Capacity: {MAX_CAP} people")
+        print(f"+ Mass Event Threshold: {MASS_TH} people in {MASS_WIN_MS // 1000}s")
+        print("\n" + _SEP_EQ)
         print("System Ready! Monitoring started...")
-        print("="*45 + "\n")
+        print(_SEP_EQ + "\n")
     
     def blink_led(self, led):
         """Blink an LED"""
         if led:
-            led.value(1)
-            time.sleep(0.2)
-            led.value(0)
+            self._start_led_pattern(led, 1, 200)
     
     def alert_led_pattern(self, led):
         """Alert LED pattern for warnings"""
         if led:
-            for _ in range(3):
-                led.value(1)
-                time.sleep(0.1)
-                led.value(0)
-                time.sleep(0.1)
+            # on, off, on, off, on, off - 100ms each
+            self._start_led_pattern(led, 5, 100)
+    
+    def _start_led_pattern(self, led, toggles, period_ms):
+        """Switch an LED on and let _update_leds toggle it without blocking"""
+        led.value(1)
+        self._led_timers[led] = [toggles, time.ticks_add(self._now, period_ms), period_ms]
     
-    def get_time_str(self):
-        """Get formatted time string"""
-        secs = time.time()
-        mins = int(secs / 60)
-        hrs = int(mins / 60)
-        secs = int(secs % 60)
-        mins = mins % 60
+    def _update_leds(self, now):
+        """Toggle LEDs whose pattern step is due"""
+        for led, timer in list(self._led_timers.items()):
+            if time.ticks_diff(now, timer[1]) >= 0:
+                timer[0] -= 1
+                led.value(timer[0] & 1)  # Odd toggles left: on, even: off
+                if timer[0]:
+                    timer[1] = time.ticks_add(timer[1], timer[2])
+                else:
+                    del self._led_timers[led]
+    
+    def get_time_str(self, now=None):
+        """Get formatted time string (now in wall-clock seconds, default time.time())"""
+        hrs, rem = divmod(int(time.time() if now is None else now), 3600)
+        mins, secs = divmod(rem, 60)
         return f"{hrs:02d}:{mins:02d}:{secs:02d}"
     
-    def clean_old_events(self, event_list):
-        """Remove events outside the time window"""
-        current_time = time.time()
-        cutoff_time = current_time - self.mass_event_window
-        # Keep only events within the time window
-        return [t for t in event_list if t > cutoff_time]
+    def _push_entry(self, now):
+        """Record an entry for mass event detection"""
+        if self._recent_entry_count:
+            self.recent_entries.append(now)
+        else:
+            self._oldest_entry = now
+        self._recent_entry_count += 1
+    
+    def _pop_expired_entries(self, now):
+        """Forget entries outside the time window"""
+        while self._recent_entry_count and time.ticks_diff(now, self._oldest_entry) >= MASS_WIN_MS:
+            self._recent_entry_count -= 1
+            if self._recent_entry_count:
+                self._oldest_entry = self.recent_entries.popleft()
     
-    def check_mass_event(self, event_list, event_type):
+    def _push_exit(self, now):
+        """Record an exit for mass event detection"""
+        if self._recent_exit_count:
+            self.recent_exits.append(now)
+        else:
+            self._oldest_exit = now
+        self._recent_exit_count += 1
+    
+    def _pop_expired_exits(self, now):
+        """Forget exits outside the time window"""
+        while self._recent_exit_count and time.ticks_diff(now, self._oldest_exit) >= MASS_WIN_MS:
+            self._recent_exit_count -= 1
+            if self._recent_exit_count:
+                self._oldest_exit = self.recent_exits.popleft()
+    
+    def check_mass_event(self, event_count, event_type):
         """Check if a mass event is occurring"""
-        if len(event_list) >= self.mass_event_threshold:
-            print("\n" + "!"*45)
-            print(f"   ALERT: MASS {event_type.upper()} DETECTED!")
-            print(f"   {len(event_list)} people {event_type} in {self.mass_event_window}s")
-            print("   Current occupancy: {} people".format(self.inside))
-            print("!"*45 + "\n")
+        if event_count >= MASS_TH:
+            if LOG:
+                print(f"\n{_SEP_BANG}\n   ALERT: MASS {event_type.upper()} DETECTED!\n   {event_count} people {event_type} in {MASS_WIN_MS // 1000}s\n   Current occupancy: {self.inside} people\n{_SEP_BANG}\n")
             return True
         return False
     
     def check_capacity(self):
         """Check if room capacity is exceeded"""
-        if self.inside >= self.max_capacity:
+        if self.inside >= MAX_CAP:
             if not self.room_occupied_alert_active:
-                print("\n" + "!"*45)
-                print("   ALERT: ROOM AT MAXIMUM CAPACITY!")
-                print(f"   Current: {self.inside}/{self.max_capacity} people")
-                print("   No more entries allowed - Room Occupied")
-                print("!"*45 + "\n")
+                if LOG:
+                    print(f"\n{_SEP_BANG}\n   ALERT: ROOM AT MAXIMUM CAPACITY!\n   Current: {self.inside}/{MAX_CAP} people\n   No more entries allowed - Room Occupied\n{_SEP_BANG}\n")
                 self.room_occupied_alert_active = True
                 # Flash both LEDs as warning
                 self.alert_led_pattern(self.led_entry)
@@ -165,129 +250,116 @@ class PeopleCounter:
             return True
         else:
             if self.room_occupied_alert_active:
-                print("\n" + "="*45)
-                print("   Room capacity back to normal")
-                print(f"   Current: {self.inside}/{self.max_capacity} people")
-                print("="*45 + "\n")
+                if LOG:
+                    print(f"\n{_SEP_EQ}\n   Room capacity back to normal\n   Current: {self.inside}/{MAX_CAP} people\n{_SEP_EQ}\n")
                 self.room_occupied_alert_active = False
             return False
     
-    def check_entry(self):
-        """Check entry sensor"""
-        current_time = time.time()
+    def _check_sensor(self, sensor, led, direction, now):
+        """Check a doorway sensor, direction is +1 for entry and -1 for exit"""
+        entering = direction > 0
         
-        # Check cooldown
-        if current_time - self.last_entry_time < self.cooldown:
+        # Check cooldown before pinging; while the room is full entries would
+        # only be blocked again, so the entry sensor backs off for longer
+        if entering:
+            last_time = self.last_entry_time
+            cooldown = FULL_COOLDOWN_MS if self.inside >= MAX_CAP else COOLDOWN_MS
+        else:
+            last_time = self.last_exit_time
+            cooldown = COOLDOWN_MS
+        if time.ticks_diff(now, last_time) < cooldown:
             return False
         
-        # Measure distance
-        distance = self.entry_sensor.measure()
-        
-        # Check if person detected (close distance)
-        if distance < self.threshold and distance > 2:
-            # Check if room is at capacity
-            if self.inside >= self.max_capacity:
-                print(f"[{self.get_time_str()}] >> ENTRY BLOCKED - ROOM AT CAPACITY")
-                print(f"    Current: {self.inside}/{self.max_capacity} people")
-                print(f"    Entry denied for safety\n")
-                self.alert_led_pattern(self.led_entry)
-                self.last_entry_time = current_time
-                return False
-            
-            self.entries += 1
-            self.inside += 1
-            self.last_entry_time = current_time
-            
-            # Track for mass event detection
-            self.recent_entries.append(current_time)
-            self.recent_entries = self.clean_old_events(self.recent_entries)
-            
-            # Visual feedback
-            self.blink_led(self.led_entry)
-            
-            # Print detection
-            print(f"[{self.get_time_str()}] >> PERSON ENTERED")
-            print(f"    Distance: {distance:.1f} cm")
-            print(f"    Total Inside: {self.inside}/{self.max_capacity}")
-            
-            # Check for mass entry event
-            if self.check_mass_event(self.recent_entries, "entry"):
-                pass  # Alert already printed in check_mass_event
-            
-            # Check capacity
-            self.check_capacity()
-            
-            print()
-            
-            return True
-        
-        return False
-    
-    def check_exit(self):
-        """Check exit sensor"""
-        current_time = time.time()
-        
-        # Check cooldown
-        if current_time - self.last_exit_time < self.cooldown:
+        # Fire a ping and pick up its echo on a later pass
+        if not sensor._ready:
+            sensor.ping()
             return False
         
-        # Measure distance
-        distance = self.exit_sensor.measure()
+        # Distance captured by the echo IRQ
+        distance = sensor.distance()
         
-        # Check if person detected
-        if distance < self.threshold and distance > 2:
-            # Only process exit if there are people inside
-            if self.inside <= 0:
-                print(f"[{self.get_time_str()}] << EXIT IGNORED - Room is empty")
-                self.last_exit_time = current_time
-                return False
+        # Check if person detected (close distance)
+        if distance < THRESHOLD_CM and distance > 2:
+            self._last_event_ts = now
             
-            self.exits += 1
-            self.inside -= 1
-            self.last_exit_time = current_time
+            if entering:
+                # Check if room is at capacity
+                if self.inside >= MAX_CAP:
+                    if LOG:
+                        print(f"[{self.get_time_str()}] >> ENTRY BLOCKED - ROOM AT CAPACITY\n    Current: {self.inside}/{MAX_CAP} people\n    Entry denied for safety\n")
+                    
+                    self.alert_led_pattern(led)
+                    self.last_entry_time = now
+                    return False
+                
+                self.entries += 1
+                self.last_entry_time = now
+                
+                # Track for mass event detection
+                self._push_entry(now)
+                self._pop_expired_entries(now)
+                event_type, event_count = "entry", self._recent_entry_count
+                banner = ">> PERSON ENTERED"
+            else:
+                # Only process exit if there are people inside
+                if self.inside <= 0:
+                    if LOG:
+                        print(f"[{self.get_time_str()}] << EXIT IGNORED - Room is empty")
+                    self.last_exit_time = now
+                    return False
+                
+                self.exits += 1
+                self.last_exit_time = now
+                
+                # Track for mass event detection
+                self._push_exit(now)
+                self._pop_expired_exits(now)
+                event_type, event_count = "exit", self._recent_exit_count
+                banner = "<< PERSON EXITED"
             
-            # Track for mass event detection
-            self.recent_exits.append(current_time)
-            self.recent_exits = self.clean_old_events(self.recent_exits)
+            self.inside += direction
             
             # Visual feedback
-            self.blink_led(self.led_exit)
+            self.blink_led(led)
             
             # Print detection
-            print(f"[{self.get_time_str()}] << PERSON EXITED")
-            print(f"    Distance: {distance:.1f} cm")
-            print(f"    Total Inside: {self.inside}/{self.max_capacity}")
+            if LOG:
+                print(f"[{self.get_time_str()}] {banner}\n    Distance: {distance} cm\n    Total Inside: {self.inside}/{MAX_CAP}\n")
             
-            # Check for mass exit event
-            if self.check_mass_event(self.recent_exits, "exit"):
+            # Check for mass entry/exit event
+            if self.check_mass_event(event_count, event_type):
                 pass  # Alert already printed in check_mass_event
             
-            # Check if capacity normalized
+            # Check capacity (or whether it normalized)
             self.check_capacity()
             
-            print()
-            
             return True
         
+        # Nothing in range, keep scanning
+        sensor.ping()
         return False
     
+    def _age_timestamps(self, now):
+        """Pull old timestamps forward so ticks_diff() stays valid as ticks wrap"""
+        long_ago = time.ticks_add(now, -STALE_MS)
+        if time.ticks_diff(now, self.last_entry_time) > STALE_MS:
+            self.last_entry_time = long_ago
+        if time.ticks_diff(now, self.last_exit_time) > STALE_MS:
+            self.last_exit_time = long_ago
+        if time.ticks_diff(now, self._last_event_ts) > STALE_MS:
+            self._last_event_ts = long_ago
+    
     def show_stats(self):
         """Display statistics"""
-        print("\n" + "="*45)
-        print("         STATISTICS")
-        print("="*45)
-        print(f"  Total Entries:     {self.entries:4d}")
-        print(f"  Total Exits:       {self.exits:4d}")
-        print(f"  Currently Inside:  {self.inside:4d} / {self.max_capacity}")
-        capacity_percent = (self.inside / self.max_capacity) * 100
-        print(f"  Capacity Usage:    {capacity_percent:5.1f}%")
-        if self.inside >= self.max_capacity:
-            print("  Status:            ROOM OCCUPIED")
-        elif self.inside >= self.max_capacity * 0.8:
-            print("  Status:            NEAR CAPACITY")
-        else:
-            print("  Status:            NORMAL")
-        print("="*45 + "\n")
+        if LOG:
+            capacity_percent = (self.inside / MAX_CAP) * 100
+            if self.inside >= MAX_CAP:
+                status = "ROOM OCCUPIED"
+            elif self.inside >= MAX_CAP * 0.8:
+                status = "NEAR CAPACITY"
+            else:
+                status = "NORMAL"
+            print(f"\n{_STATS_HEADER}\n  Total Entries:     {self.entries:4d}\n  Total Exits:       {self.exits:4d}\n  Currently Inside:  {self.inside:4d} / {MAX_CAP}\n  Capacity Usage:    {capacity_percent:5.1f}%\n  Status:            {status}\n{_SEP_EQ}\n")
     
     def run(self):
         """Main loop"""
@@ -295,42 +367,66 @@ class PeopleCounter:
         print("   (In Wokwi: Click sensors to change distance)")
         print("   (Press Stop button to end)\n")
         
-        last_stats = time.time()
-        stats_interval = 15  # Show stats every 15 seconds
+        next_stats = time.ticks_add(time.ticks_ms(), STATS_MS)
         
-        loop_count = 0
+        # Countdowns to the periodic work (cheaper than loop_count % N)
+        clean_ctr = 1  # Clean on the first pass
+        running_ctr = 500
+        phase = 0  # Which sensor this pass services
         
         try:
             while True:
-                # Clean old events periodically
-                if loop_count % 100 == 0:
-                    self.recent_entries = self.clean_old_events(self.recent_entries)
-                    self.recent_exits = self.clean_old_events(self.recent_exits)
+                # Read the clock once per pass
+                now = time.ticks_ms()
+                self._now = now
+                
+                # Clean old events every 100 loops
+                clean_ctr -= 1
+                if not clean_ctr:
+                    clean_ctr = 100
+                    # Usually idle: skip the calls when nothing is tracked
+                    if self._recent_entry_count:
+                        self._pop_expired_entries(now)
+                    if self._recent_exit_count:
+                        self._pop_expired_exits(now)
+                    self._age_timestamps(now)
+                
+                # Alternate the sensors so their pings never overlap: each
+                # echo (max ~38ms) ends before the other sensor fires
+                phase ^= 1
+                if phase:
+                    self._check_sensor(self.entry_sensor, self.led_entry, +1, now)
+                else:
+                    self._check_sensor(self.exit_sensor, self.led_exit, -1, now)
                 
-                # Check both sensors
-                self.check_entry()
-                self.check_exit()
+                # Advance LED blink patterns
+                if self._led_timers:
+                    self._update_leds(now)
                 
                 # Periodic stats
-                current = time.time()
-                if current - last_stats >= stats_interval:
+                if time.ticks_diff(now, next_stats) >= 0:
                     self.show_stats()
-                    last_stats = current
+                    next_stats = time.ticks_add(next_stats, STATS_MS)
                 
-                # Small delay
-                time.sleep(0.1)
+                # Scan faster right after activity, slower when idle
+                idle_dt = time.ticks_diff(now, self._last_event_ts)
+                if idle_dt < 5000:
+                    time.sleep_ms(ACTIVE_SLEEP_MS)
+                elif idle_dt < 60000:
+                    time.sleep_ms(IDLE_SLEEP_MS)
+                else:
+                    time.sleep_ms(DORMANT_SLEEP_MS)
                 
-                # Progress indicator every 50 loops
-                loop_count += 1
-                if loop_count % 50 == 0:
-                    print(".", end="")
-                if loop_count % 500 == 0:
-                    print(" [Running]")
+                # Progress indicator every 500 loops (one dot per 50), in one write
+                running_ctr -= 1
+                if not running_ctr:
+                    running_ctr = 500
+                    print(_PROGRESS)
         
         except KeyboardInterrupt:
-            print("\n\n" + "="*45)
+            print("\n\n" + _SEP_EQ)
             print("   SYSTEM STOPPED")
-            print("="*45)
+            print(_SEP_EQ)
             self.show_stats()
             print("Thank you for using People Counter!")
         
@@ -341,7 +437,7 @@ class PeopleCounter:
 
 # Auto-start when uploaded to Wokwi
 print("\nStarting People Counter System...")
-print("="*45)
+print(_SEP_EQ)
 
 counter = PeopleCounter()
 counter.run()
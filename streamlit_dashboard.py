@@ -1,32 +1,71 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import time
 import json
 import random
 import threading
+import queue
 import serial
 import serial.tools.list_ports
 import re
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 import os
+from collections import deque
+from itertools import islice
 
-# Load environment variables
-load_dotenv()
-
-# Telegram Bot Configuration - works locally and on Streamlit Cloud
 try:
-    # Try Streamlit secrets first (for cloud deployment)
-    TELEGRAM_BOT_TOKEN = st.secrets.get("TELEGRAM_BOT_TOKEN")
-    TELEGRAM_CHAT_ID = st.secrets.get("TELEGRAM_CHAT_ID")
-except:
-    # Fall back to .env file (for local development)
-    TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
-    TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+    from orjson import loads as json_loads  # Faster, and parses bytes directly
+except ImportError:
+    json_loads = json.loads
+
+
+# No spinner: this runs before st.set_page_config(), which must be the first element
+@st.cache_resource(show_spinner=False)
+def telegram_config():
+    """Resolve the Telegram bot token and chat ID once per server process"""
+    try:
+        # Try Streamlit secrets first (for cloud deployment)
+        return st.secrets["TELEGRAM_BOT_TOKEN"], st.secrets["TELEGRAM_CHAT_ID"]
+    except (KeyError, FileNotFoundError):
+        # Fall back to .env file (for local development)
+        load_dotenv()
+        return os.getenv('TELEGRAM_BOT_TOKEN'), os.getenv('TELEGRAM_CHAT_ID')
 
+
+# Telegram Bot Configuration - works locally and on Streamlit Cloud
+TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID = telegram_config()
 TELEGRAM_ENABLED = bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID)
+TELEGRAM_MIN_INTERVAL = 1.0  # Seconds between messages from the background sender
+
+EVENT_LOG_LEN = 50  # Newest events kept in the log
+EVENT_STYLES = {  # Event type -> (icon, background colour)
+    "ENTRY": ("🚪", "#00C851"),
+    "EXIT": ("🚶", "#ff4444"),
+}
+EVENT_STYLE_DEFAULT = ("⚙️", "#666")
+
+# Statistics card and footer markup; only the values change between reruns.
+# Rendered with st.html, which skips the Markdown pass st.markdown would do.
+CARD_TEMPLATE = (
+    '<div class="metric-card">'
+    '<h3 style="color: #333; margin-bottom: 10px;">{title}</h3>'
+    '<p style="font-size: 40px; color: {color}; font-weight: bold; margin: 0;">{value}</p>'
+    '</div>'
+)
+FOOTER_TEMPLATE = (
+    '<div style="text-align: center; color: #666;">'
+    '<p>🔧 Occupancy Sense Dashboard | Powered by Streamlit</p>'
+    '<p>Last updated: {}</p>'
+    '</div>'
+)
+
+# Occupancy time series: fixed-size ring buffer of the last 100 samples
+TIME_SERIES_LEN = 100
+TIME_SERIES_DTYPE = [('timestamp', 'datetime64[ms]'), ('occupancy', 'i4')]
 
 # Page configuration
 st.set_page_config(
@@ -37,7 +76,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better UI
-st.markdown("""
+CUSTOM_CSS = """
     <style>
     .big-font {
         font-size: 50px !important;
@@ -86,6 +125,21 @@ st.markdown("""
         0%, 100% { transform: scale(1); }
         50% { transform: scale(1.1); }
     }
+    .event-log {
+        height: 400px;
+        overflow-y: scroll;
+        border: 1px solid #ddd;
+        border-radius: 5px;
+        padding: 10px;
+        background-color: #1e1e1e;
+    }
+    .event-item {
+        color: white;
+        padding: 12px;
+        border-radius: 5px;
+        margin-bottom: 8px;
+        font-family: sans-serif;
+    }
     /* Custom scrollbar styling */
     div::-webkit-scrollbar {
         width: 8px;
@@ -102,11 +156,23 @@ st.markdown("""
         background: #555;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
 
-# Initialize session state
-if 'counter_data' not in st.session_state:
-    st.session_state.counter_data = {
+
+@st.cache_resource
+def minified_css():
+    """Collapse CUSTOM_CSS whitespace once per server process"""
+    return re.sub(r'\s+', ' ', CUSTOM_CSS).strip()
+
+
+# Streamlit drops any element a rerun does not emit, so the stylesheet has to
+# go out on every run; send it minified to keep that payload small
+st.markdown(minified_css(), unsafe_allow_html=True)
+
+# Initialize session state. Mutable defaults are factories, called only for
+# keys the session is missing, so reruns do not build values just to discard them
+SESSION_DEFAULTS = {
+    'counter_data': lambda: {
         'entries': 0,
         'exits': 0,
         'inside': 0,
@@ -117,48 +183,104 @@ if 'counter_data' not in st.session_state:
         'alert_active': False,
         'alert_type': None,
         'alert_message': None
-    }
+    },
+    'event_log': lambda: deque(maxlen=EVENT_LOG_LEN),
+    'ts_buf': lambda: np.empty(TIME_SERIES_LEN, dtype=TIME_SERIES_DTYPE),
+    'ts_head': 0,  # Next slot to write
+    'ts_count': 0,  # Valid samples
+    'last_counts': None,  # (entries, exits, inside) of the newest sample
+    'peak_occupancy': 0,  # Highest sample since the last reset
+    'footer_ts': (None, ''),  # (epoch second, formatted text) shown in the footer
+    'ts_fig': None,  # Last occupancy chart and the signature it was built for
+    'ts_fig_sig': None,
+    'gauge_fig': None,  # Last occupancy gauge and the signature it was built for
+    'gauge_fig_sig': None,
+    'serial_connection': None,
+    'serial_connected': False,
+    'serial_queue': None,
+    'serial_stop': None,  # threading.Event for the reader thread
+    'last_serial_data': None,
+    'telegram_notified': False,
+    'last_telegram_notification': None,
+}
+for key, value in SESSION_DEFAULTS.items():
+    if key not in st.session_state:
+        st.session_state[key] = value() if callable(value) else value
 
-if 'event_log' not in st.session_state:
-    st.session_state.event_log = []
 
-if 'time_series' not in st.session_state:
-    st.session_state.time_series = pd.DataFrame(columns=['timestamp', 'occupancy'])
+def make_telegram_session():
+    """HTTP session that keeps its TLS connection to api.telegram.org alive"""
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+    return session
 
-if 'serial_connection' not in st.session_state:
-    st.session_state.serial_connection = None
 
-if 'serial_connected' not in st.session_state:
-    st.session_state.serial_connected = False
-
-if 'last_serial_data' not in st.session_state:
-    st.session_state.last_serial_data = None
+def send_telegram_notification(message, silent=False, session=None, attempts=1):
+    """Send notification via Telegram bot, backing off when rate limited"""
+    if not TELEGRAM_ENABLED:
+        return False
+    
+    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+    payload = {
+        'chat_id': TELEGRAM_CHAT_ID,
+        'text': message,
+        'parse_mode': 'HTML',
+        'disable_notification': silent
+    }
+    delay = 1
+    for attempt in range(attempts):
+        try:
+            response = (session or requests).post(url, json=payload, timeout=5)
+            if response.status_code == 200:
+                return True
+            if response.status_code != 429:
+                print(f"Telegram notification failed: HTTP {response.status_code}")
+                return False
+            # Rate limited: honour Telegram's retry_after hint when present
+            try:
+                delay = int(response.json()['parameters']['retry_after'])
+            except Exception:
+                delay = int(response.headers.get('Retry-After', delay))
+        except Exception as e:
+            print(f"Telegram notification failed: {e}")
+        if attempt + 1 < attempts:
+            time.sleep(delay)
+            delay *= 2
+    return False
 
-if 'telegram_notified' not in st.session_state:
-    st.session_state.telegram_notified = False
 
-if 'last_telegram_notification' not in st.session_state:
-    st.session_state.last_telegram_notification = None
+@st.cache_resource
+def telegram_worker():
+    """Start the background Telegram sender (once per server process)"""
+    pending = {}  # kind -> (message, silent); a newer message replaces a queued one
+    wakeup = threading.Condition()
+    
+    def run():
+        session = make_telegram_session()  # Owned by this thread only
+        while True:
+            with wakeup:
+                while not pending:
+                    wakeup.wait()
+                kind = next(iter(pending))
+                message, silent = pending.pop(kind)
+            send_telegram_notification(message, silent, session, attempts=4)
+            time.sleep(TELEGRAM_MIN_INTERVAL)
+    
+    threading.Thread(target=run, daemon=True).start()
+    return pending, wakeup
 
 
-def send_telegram_notification(message, silent=False):
-    """Send notification via Telegram bot"""
+def queue_telegram_notification(kind, message, silent=False):
+    """Hand a notification to the background sender without blocking"""
     if not TELEGRAM_ENABLED:
         return False
     
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-        payload = {
-            'chat_id': TELEGRAM_CHAT_ID,
-            'text': message,
-            'parse_mode': 'HTML',
-            'disable_notification': silent
-        }
-        response = requests.post(url, json=payload, timeout=5)
-        return response.status_code == 200
-    except Exception as e:
-        print(f"Telegram notification failed: {e}")
-        return False
+    pending, wakeup = telegram_worker()
+    with wakeup:
+        pending.pop(kind, None)  # Re-queue at the back so order follows the latest state
+        pending[kind] = (message, silent)
+        wakeup.notify()
+    return True
 
 
 def check_and_notify_capacity(inside, max_capacity, entries, exits):
@@ -181,10 +303,10 @@ def check_and_notify_capacity(inside, max_capacity, entries, exits):
                 f"⏰ Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
             )
             
-            if send_telegram_notification(message):
+            if queue_telegram_notification('capacity', message):
                 st.session_state.telegram_notified = True
                 st.session_state.last_telegram_notification = current_time
-                add_event_log("TELEGRAM", "Capacity alert sent via Telegram")
+                add_event_log("TELEGRAM", "Capacity alert queued for Telegram")
     
     # Room is back to normal
     elif inside < max_capacity * 0.9:  # 90% threshold for "back to normal"
@@ -196,55 +318,125 @@ def check_and_notify_capacity(inside, max_capacity, entries, exits):
                 f"⏰ Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
             )
             
-            send_telegram_notification(message, silent=True)
+            queue_telegram_notification('normal', message, silent=True)
             st.session_state.telegram_notified = False
-            add_event_log("TELEGRAM", "Normal capacity notification sent")
+            add_event_log("TELEGRAM", "Normal capacity notification queued")
+
+
+_TOTAL_RE = re.compile(rb'Total Inside:\s*(\d+)')
+
+
+def _parse_total(line):
+    match = _TOTAL_RE.search(line)
+    if match:
+        return {'type': 'update', 'inside': int(match.group(1))}
+    return None
 
 
-def parse_serial_line(line):
-    """Parse ESP32 serial output for counter data"""
+def _capacity_alert(line):
+    return {'type': 'alert', 'alert_type': 'capacity', 'alert_message': 'Room at maximum capacity!'}
+
+
+# Text format markers (main.py), probed in order against the raw bytes
+_DISPATCH = (
+    (b'PERSON ENTERED', lambda line: {'type': 'entry'}),
+    (b'PERSON EXITED', lambda line: {'type': 'exit'}),
+    (b'Total Inside:', _parse_total),
+    (b'ROOM AT MAXIMUM CAPACITY', _capacity_alert),
+    (b'ROOM OCCUPIED', _capacity_alert),
+    (b'MASS ENTRY DETECTED', lambda line: {'type': 'alert', 'alert_type': 'mass_entry', 'alert_message': 'Mass entry detected!'}),
+    (b'MASS EXIT DETECTED', lambda line: {'type': 'alert', 'alert_type': 'mass_exit', 'alert_message': 'Mass exit detected!'}),
+)
+
+
+def parse_serial_line(line, json_only=False):
+    """Parse one raw ESP32 serial line (bytes) for counter data"""
     try:
         # Check for JSON format (main_with_json.py)
-        if line.startswith('JSON:'):
-            data = json.loads(line[5:])
-            return data
+        if line[:5] == b'JSON:':
+            return json_loads(line[5:])
         
-        # Parse text format (main.py)
-        if 'PERSON ENTERED' in line:
-            return {'type': 'entry'}
-        elif 'PERSON EXITED' in line:
-            return {'type': 'exit'}
-        elif 'Total Inside:' in line:
-            match = re.search(r'Total Inside:\s*(\d+)', line)
-            if match:
-                return {'type': 'update', 'inside': int(match.group(1))}
-        elif 'ROOM AT MAXIMUM CAPACITY' in line or 'ROOM OCCUPIED' in line:
-            return {'type': 'alert', 'alert_type': 'capacity', 'alert_message': 'Room at maximum capacity!'}
-        elif 'MASS ENTRY DETECTED' in line:
-            return {'type': 'alert', 'alert_type': 'mass_entry', 'alert_message': 'Mass entry detected!'}
-        elif 'MASS EXIT DETECTED' in line:
-            return {'type': 'alert', 'alert_type': 'mass_exit', 'alert_message': 'Mass exit detected!'}
+        # main_with_json.py repeats every event as JSON, so its text banners are noise
+        if json_only:
+            return None
+        
+        # Parse text format (main.py) without decoding
+        for marker, handler in _DISPATCH:
+            if marker in line:
+                return handler(line)
     except Exception as e:
         pass
     return None
 
 
-def read_serial_data():
-    """Read all available data from serial port"""
-    events = []
-    if st.session_state.serial_connection and st.session_state.serial_connected:
-        try:
-            # Read all available lines in buffer
-            while st.session_state.serial_connection.in_waiting > 0:
-                line = st.session_state.serial_connection.readline().decode('utf-8', errors='ignore').strip()
+def serial_reader(ser, events, stop):
+    """Background thread: parse lines as they arrive and queue the events"""
+    residual = b''  # Trailing partial line carried between reads
+    json_only = False  # Set once the device is seen speaking JSON
+    try:
+        while not stop.is_set():
+            # One read for everything buffered (blocks up to the timeout when idle)
+            data = ser.read(ser.in_waiting or 1)
+            if not data:
+                continue
+            *lines, residual = (residual + data).split(b'\n')
+            for line in lines:
+                line = line.strip()
                 if line:
-                    event = parse_serial_line(line)
+                    event = parse_serial_line(line, json_only)
                     if event:
-                        events.append(event)
-                        st.session_state.last_serial_data = event
-        except Exception as e:
-            st.session_state.serial_connected = False
-            return None
+                        json_only = json_only or line[:5] == b'JSON:'
+                        events.put_nowait(event)
+    except Exception:
+        if not stop.is_set():
+            events.put_nowait(None)  # Tell the UI the port went away
+
+
+def start_serial_reader(port, baud_rate):
+    """Open the serial port and start its reader thread"""
+    stop_serial_reader()
+    ser = serial.Serial(port, baud_rate, timeout=0.1)
+    # Drop the USB-serial latency timer to 1 ms where supported (Linux)
+    try:
+        ser.set_low_latency_mode(True)
+    except Exception:
+        pass
+    events = queue.SimpleQueue()
+    stop = threading.Event()
+    threading.Thread(target=serial_reader, args=(ser, events, stop), daemon=True).start()
+    st.session_state.serial_connection = ser
+    st.session_state.serial_queue = events
+    st.session_state.serial_stop = stop
+    st.session_state.serial_connected = True
+
+
+def stop_serial_reader():
+    """Stop the reader thread and close the serial port"""
+    if st.session_state.serial_stop:
+        st.session_state.serial_stop.set()
+        st.session_state.serial_stop = None
+    if st.session_state.serial_connection:
+        st.session_state.serial_connection.close()
+        st.session_state.serial_connection = None
+    st.session_state.serial_queue = None
+    st.session_state.serial_connected = False
+
+
+def read_serial_data():
+    """Drain the events queued by the serial reader thread"""
+    events = []
+    if st.session_state.serial_queue and st.session_state.serial_connected:
+        while True:
+            try:
+                event = st.session_state.serial_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is None:
+                stop_serial_reader()
+                break
+            events.append(event)
+        if events:
+            st.session_state.last_serial_data = events[-1]
     return events if events else None
 
 
@@ -267,33 +459,145 @@ def update_counter_data(entries, exits, inside, alert_type=None, alert_message=N
     st.session_state.counter_data['alert_type'] = alert_type
     st.session_state.counter_data['alert_message'] = alert_message
     
+    # Nothing moved: no new sample and no capacity re-check
+    counts = (entries, exits, inside)
+    if counts == st.session_state.last_counts:
+        return
+    st.session_state.last_counts = counts
+    
     # Check and send Telegram notification if capacity reached
     check_and_notify_capacity(inside, st.session_state.counter_data['max_capacity'], entries, exits)
     
-    # Add to time series
-    new_row = pd.DataFrame({
-        'timestamp': [datetime.now()],
-        'occupancy': [inside]
-    })
-    st.session_state.time_series = pd.concat([st.session_state.time_series, new_row], ignore_index=True)
-    
-    # Keep only last 100 records
-    if len(st.session_state.time_series) > 100:
-        st.session_state.time_series = st.session_state.time_series.tail(100)
+    # Add to time series (overwrites the oldest sample once full)
+    head = st.session_state.ts_head
+    st.session_state.ts_buf[head] = (np.datetime64(datetime.now(), 'ms'), inside)
+    st.session_state.ts_head = (head + 1) % TIME_SERIES_LEN
+    st.session_state.ts_count = min(st.session_state.ts_count + 1, TIME_SERIES_LEN)
+    st.session_state.peak_occupancy = max(st.session_state.peak_occupancy, inside)
+
+
+def reset_time_series():
+    """Clear the time series"""
+    st.session_state.ts_head = 0
+    st.session_state.ts_count = 0
+    st.session_state.last_counts = None
+    st.session_state.peak_occupancy = 0
+
+
+def time_series_view():
+    """Time series samples, oldest first"""
+    buf = st.session_state.ts_buf
+    count = st.session_state.ts_count
+    if count < TIME_SERIES_LEN:
+        return buf[:count]
+    head = st.session_state.ts_head
+    return np.concatenate((buf[head:], buf[:head]))
 
 
 def add_event_log(event_type, details):
     """Add event to log"""
     event = {
-        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'ts_ns': time.time_ns(),  # Formatted only when the row is rendered
         'type': event_type,
         'details': details
     }
-    st.session_state.event_log.insert(0, event)
+    # Newest first; maxlen drops the oldest
+    st.session_state.event_log.appendleft(event)
+
+
+def build_gauge(inside, max_cap):
+    """Build the occupancy gauge"""
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number+delta",
+        value=inside,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        title={'text': "People Inside", 'font': {'size': 24}},
+        delta={'reference': max_cap},
+        gauge={
+            'axis': {'range': [None, max_cap], 'tickwidth': 1, 'tickcolor': "darkblue"},
+            'bar': {'color': "darkblue"},
+            'bgcolor': "white",
+            'borderwidth': 2,
+            'bordercolor': "gray",
+            'steps': [
+                {'range': [0, max_cap * 0.5], 'color': '#00C851'},
+                {'range': [max_cap * 0.5, max_cap * 0.8], 'color': '#ffaa00'},
+                {'range': [max_cap * 0.8, max_cap], 'color': '#ff4444'}
+            ],
+            'threshold': {
+                'line': {'color': "red", 'width': 4},
+                'thickness': 0.75,
+                'value': max_cap
+            }
+        }
+    ))
     
-    # Keep only last 50 events
-    if len(st.session_state.event_log) > 50:
-        st.session_state.event_log = st.session_state.event_log[:50]
+    fig.update_layout(height=300)
+    return fig
+
+
+def gauge_chart(inside, max_cap):
+    """Occupancy gauge, rebuilt only when the count or the capacity changed"""
+    sig = (inside, max_cap)
+    if st.session_state.gauge_fig_sig != sig:
+        st.session_state.gauge_fig = build_gauge(inside, max_cap)
+        st.session_state.gauge_fig_sig = sig
+    return st.session_state.gauge_fig
+
+
+def build_time_series_chart(samples, max_cap):
+    """Build the occupancy chart"""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=samples['timestamp'],
+        y=samples['occupancy'],
+        mode='lines+markers',
+        name='Occupancy',
+        line=dict(color='#1f77b4', width=2),
+        marker=dict(size=6)
+    ))
+    
+    # Add capacity line
+    fig.add_hline(
+        y=max_cap,
+        line_dash="dash",
+        line_color="red",
+        annotation_text="Max Capacity",
+        annotation_position="right"
+    )
+    
+    fig.update_layout(
+        xaxis_title="Time",
+        yaxis_title="Number of People",
+        height=300,
+        hovermode='x unified'
+    )
+    
+    return fig
+
+
+def time_series_chart(samples, max_cap):
+    """Occupancy chart, rebuilt only when a sample was added or the capacity changed"""
+    sig = (len(samples), samples[-1].item(), max_cap)
+    if st.session_state.ts_fig_sig != sig:
+        st.session_state.ts_fig = build_time_series_chart(samples, max_cap)
+        st.session_state.ts_fig_sig = sig
+    return st.session_state.ts_fig
+
+
+def footer_timestamp():
+    """Footer clock text, formatted at most once per wall-clock second"""
+    now_s = int(time.time())
+    if st.session_state.footer_ts[0] != now_s:
+        st.session_state.footer_ts = (now_s, datetime.fromtimestamp(now_s).strftime("%Y-%m-%d %H:%M:%S"))
+    return st.session_state.footer_ts[1]
+
+
+def watch_serial():
+    """Periodic fragment: repaint the whole app only when serial events are waiting"""
+    events = st.session_state.serial_queue
+    if events is not None and not events.empty():
+        st.rerun()
 
 
 # Main dashboard
@@ -327,22 +631,17 @@ with st.sidebar:
                 st.session_state.counter_data['inside'] += 1
                 add_event_log("ENTRY", f"Person entered. Inside: {st.session_state.counter_data['inside']}")
                 
-                # Update time series
+                # Update time series, raising the capacity alert if this entry filled the room
+                if st.session_state.counter_data['inside'] >= max_capacity:
+                    alert = ("capacity", "🚨 ROOM AT MAXIMUM CAPACITY!")
+                else:
+                    alert = (None, None)
                 update_counter_data(
                     st.session_state.counter_data['entries'],
                     st.session_state.counter_data['exits'],
-                    st.session_state.counter_data['inside']
+                    st.session_state.counter_data['inside'],
+                    *alert
                 )
-                
-                # Check for alerts
-                if st.session_state.counter_data['inside'] >= max_capacity:
-                    update_counter_data(
-                        st.session_state.counter_data['entries'],
-                        st.session_state.counter_data['exits'],
-                        st.session_state.counter_data['inside'],
-                        "capacity",
-                        "🚨 ROOM AT MAXIMUM CAPACITY!"
-                    )
                 st.rerun()
         
         if st.button("🚶 Simulate Exit"):
@@ -366,8 +665,8 @@ with st.sidebar:
             st.session_state.counter_data['exits'] = 0
             st.session_state.counter_data['inside'] = 0
             st.session_state.counter_data['alert_active'] = False
-            st.session_state.event_log = []
-            st.session_state.time_series = pd.DataFrame(columns=['timestamp', 'occupancy'])
+            st.session_state.event_log.clear()
+            reset_time_series()
             add_event_log("SYSTEM", "Counter reset")
             st.rerun()
     else:
@@ -390,21 +689,14 @@ with st.sidebar:
         with col_btn1:
             if st.button("🔌 Connect"):
                 try:
-                    if st.session_state.serial_connection:
-                        st.session_state.serial_connection.close()
-                    st.session_state.serial_connection = serial.Serial(serial_port, baud_rate, timeout=0.1)
-                    st.session_state.serial_connected = True
-                    time.sleep(1)  # Wait for connection to stabilize
+                    start_serial_reader(serial_port, baud_rate)
                     st.rerun()
                 except Exception as e:
                     st.error(f"Failed to connect: {e}")
         
         with col_btn2:
             if st.button("🔌 Disconnect"):
-                if st.session_state.serial_connection:
-                    st.session_state.serial_connection.close()
-                    st.session_state.serial_connection = None
-                st.session_state.serial_connected = False
+                stop_serial_reader()
                 st.rerun()
         
         st.markdown("---")
@@ -530,8 +822,8 @@ with st.sidebar:
         st.session_state.counter_data['exits'] = 0
         st.session_state.counter_data['inside'] = 0
         st.session_state.counter_data['alert_active'] = False
-        st.session_state.event_log = []
-        st.session_state.time_series = pd.DataFrame(columns=['timestamp', 'occupancy'])
+        st.session_state.event_log.clear()
+        reset_time_series()
         add_event_log("SYSTEM", "All counters reset to zero")
         st.success("✓ Counters reset!")
         st.rerun()
@@ -552,7 +844,9 @@ with st.sidebar:
                 f"Your Occupancy Sense bot is working!\\n"
                 f"⏰ {datetime.now().strftime('%H:%M:%S')}"
             )
-            if send_telegram_notification(test_msg):
+            if 'telegram_session' not in st.session_state:
+                st.session_state.telegram_session = make_telegram_session()
+            if send_telegram_notification(test_msg, session=st.session_state.telegram_session):
                 st.success("Test message sent!")
             else:
                 st.error("Failed to send test message")
@@ -635,33 +929,7 @@ with col_gauge:
     st.subheader("🎯 Occupancy Level")
     
     # Create gauge chart
-    fig = go.Figure(go.Indicator(
-        mode="gauge+number+delta",
-        value=inside,
-        domain={'x': [0, 1], 'y': [0, 1]},
-        title={'text': "People Inside", 'font': {'size': 24}},
-        delta={'reference': max_cap},
-        gauge={
-            'axis': {'range': [None, max_cap], 'tickwidth': 1, 'tickcolor': "darkblue"},
-            'bar': {'color': "darkblue"},
-            'bgcolor': "white",
-            'borderwidth': 2,
-            'bordercolor': "gray",
-            'steps': [
-                {'range': [0, max_cap * 0.5], 'color': '#00C851'},
-                {'range': [max_cap * 0.5, max_cap * 0.8], 'color': '#ffaa00'},
-                {'range': [max_cap * 0.8, max_cap], 'color': '#ff4444'}
-            ],
-            'threshold': {
-                'line': {'color': "red", 'width': 4},
-                'thickness': 0.75,
-                'value': max_cap
-            }
-        }
-    ))
-    
-    fig.update_layout(height=300)
-    st.plotly_chart(fig, width='stretch')
+    st.plotly_chart(gauge_chart(inside, max_cap), width='stretch')
 
 with col_status:
     st.subheader("📋 Status")
@@ -696,37 +964,15 @@ st.markdown("---")
 # Time series chart
 col_chart, col_log = st.columns([2, 1])
 
+# Read the ring buffer once per run; the stats reduce over the NumPy column directly
+samples = time_series_view()
+occupancy = samples['occupancy']
+
 with col_chart:
     st.subheader("📈 Occupancy Over Time")
     
-    if len(st.session_state.time_series) > 0:
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=st.session_state.time_series['timestamp'],
-            y=st.session_state.time_series['occupancy'],
-            mode='lines+markers',
-            name='Occupancy',
-            line=dict(color='#1f77b4', width=2),
-            marker=dict(size=6)
-        ))
-        
-        # Add capacity line
-        fig.add_hline(
-            y=max_cap,
-            line_dash="dash",
-            line_color="red",
-            annotation_text="Max Capacity",
-            annotation_position="right"
-        )
-        
-        fig.update_layout(
-            xaxis_title="Time",
-            yaxis_title="Number of People",
-            height=300,
-            hovermode='x unified'
-        )
-        
-        st.plotly_chart(fig, width='stretch')
+    if len(samples) > 0:
+        st.plotly_chart(time_series_chart(samples, max_cap), width='stretch')
     else:
         st.info("No data available yet. Waiting for events...")
 
@@ -734,30 +980,21 @@ with col_log:
     st.subheader("📜 Event Log")
     
     if st.session_state.event_log:
-        # Build the complete HTML in one string
-        events_container = '<div style="height: 400px; overflow-y: scroll; border: 1px solid #ddd; border-radius: 5px; padding: 10px; background-color: #1e1e1e;">'
-        
-        for event in st.session_state.event_log[:20]:
-            event_type = event['type']
-            icon = "🚪" if event_type == "ENTRY" else "🚶" if event_type == "EXIT" else "⚙️"
-            
-            if event_type == "ENTRY":
-                bg_color = "#00C851"
-            elif event_type == "EXIT":
-                bg_color = "#ff4444"
-            else:
-                bg_color = "#666"
-            
-            events_container += f'<div style="background-color: {bg_color}; color: white; padding: 12px; border-radius: 5px; margin-bottom: 8px; font-family: sans-serif;">'
-            events_container += f'<strong>{icon} {event["type"]}</strong><br>'
-            events_container += f'<small style="opacity: 0.9;">{event["timestamp"]}</small><br>'
-            events_container += f'<span>{event["details"]}</span>'
-            events_container += '</div>'
-        
-        events_container += '</div>'
+        # Build the complete HTML with a single join
+        parts = ['<div class="event-log">']
+        for event in islice(st.session_state.event_log, 20):
+            icon, bg_color = EVENT_STYLES.get(event['type'], EVENT_STYLE_DEFAULT)
+            timestamp = datetime.fromtimestamp(event['ts_ns'] / 1e9).strftime("%Y-%m-%d %H:%M:%S")
+            parts.append(
+                f'<div class="event-item" style="background-color: {bg_color};">'
+                f'<strong>{icon} {event["type"]}</strong><br>'
+                f'<small style="opacity: 0.9;">{timestamp}</small><br>'
+                f'<span>{event["details"]}</span></div>'
+            )
+        parts.append('</div>')
         
         # Render once
-        st.markdown(events_container, unsafe_allow_html=True)
+        st.markdown(''.join(parts), unsafe_allow_html=True)
     else:
         st.info("No events logged yet")
 
@@ -771,70 +1008,30 @@ col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
 with col_stat1:
     # Net movement should always equal current inside count
     net_movement = st.session_state.counter_data['inside']
-    st.markdown(f"""
-        <div class="metric-card">
-            <h3 style="color: #333; margin-bottom: 10px;">Net Movement</h3>
-            <p style="font-size: 40px; color: #1f77b4; font-weight: bold; margin: 0;">
-                {net_movement}
-            </p>
-        </div>
-    """, unsafe_allow_html=True)
+    st.html(CARD_TEMPLATE.format(title="Net Movement", color="#1f77b4", value=net_movement))
 
 with col_stat2:
-    if len(st.session_state.time_series) > 0:
-        avg_occupancy = st.session_state.time_series['occupancy'].mean()
+    if len(occupancy) > 0:
+        avg_occupancy = occupancy.mean()
     else:
         avg_occupancy = 0
     
-    st.markdown(f"""
-        <div class="metric-card">
-            <h3 style="color: #333; margin-bottom: 10px;">Avg Occupancy</h3>
-            <p style="font-size: 40px; color: #ff7f0e; font-weight: bold; margin: 0;">
-                {avg_occupancy:.1f}
-            </p>
-        </div>
-    """, unsafe_allow_html=True)
+    st.html(CARD_TEMPLATE.format(title="Avg Occupancy", color="#ff7f0e", value=f"{avg_occupancy:.1f}"))
 
 with col_stat3:
-    if len(st.session_state.time_series) > 0:
-        peak_occupancy = st.session_state.time_series['occupancy'].max()
-    else:
-        peak_occupancy = 0
+    peak_occupancy = st.session_state.peak_occupancy
     
-    st.markdown(f"""
-        <div class="metric-card">
-            <h3 style="color: #333; margin-bottom: 10px;">Peak Occupancy</h3>
-            <p style="font-size: 40px; color: #d62728; font-weight: bold; margin: 0;">
-                {int(peak_occupancy)}
-            </p>
-        </div>
-    """, unsafe_allow_html=True)
+    st.html(CARD_TEMPLATE.format(title="Peak Occupancy", color="#d62728", value=int(peak_occupancy)))
 
 with col_stat4:
-    st.markdown(f"""
-        <div class="metric-card">
-            <h3 style="color: #333; margin-bottom: 10px;">Events Logged</h3>
-            <p style="font-size: 40px; color: #2ca02c; font-weight: bold; margin: 0;">
-                {len(st.session_state.event_log)}
-            </p>
-        </div>
-    """, unsafe_allow_html=True)
+    st.html(CARD_TEMPLATE.format(title="Events Logged", color="#2ca02c", value=len(st.session_state.event_log)))
 
 # Footer
 st.markdown("---")
-st.markdown("""
-    <div style="text-align: center; color: #666;">
-        <p>🔧 Occupancy Sense Dashboard | Powered by Streamlit</p>
-        <p>Last updated: {}</p>
-    </div>
-""".format(datetime.now().strftime("%Y-%m-%d %H:%M:%S")), unsafe_allow_html=True)
-
-# Auto-refresh for real-time updates
-if auto_refresh and st.session_state.serial_connected:
-    # Small delay only when in serial mode to keep checking for data
-    time.sleep(refresh_rate)
-    st.rerun()
-elif auto_refresh:
-    # Longer delay in simulation mode
-    time.sleep(0.5)
-    st.rerun()
+st.html(FOOTER_TEMPLATE.format(footer_timestamp()))
+
+# Auto-refresh for real-time updates: poll the reader queue in a fragment so idle
+# ticks skip the full script. Simulation data only changes on clicks, so it needs no timer.
+# Without a Streamlit server (bare `python` run) there is no browser to poll for.
+if auto_refresh and st.session_state.serial_connected and st.runtime.exists():
+    st.fragment(watch_serial, run_every=refresh_rate)()
@@ -4,56 +4,208 @@ Simple script to upload code to ESP32 via serial
 import serial
 import time
 
-def upload_file(port, filename, target_name="/main.py"):
+CHUNK_SIZE = 256  # Bytes per acknowledged block; fits the ESP32 stdin buffer
+REPL_BAUD = 115200  # MicroPython REPL default
+UPLOAD_BAUD = 460800  # Rate negotiated for the file transfer
+OS_BUFFER_SIZE = 65536  # Driver RX/TX queue size requested on Windows
+
+RAW_REPL_BANNER = b'raw REPL; CTRL-B to exit\r\n>'
+FRIENDLY_PROMPT = b'>>> '
+
+# Runs on the ESP32: copy exactly `size` raw bytes from stdin into the target
+# file, acknowledging each block with \x06 so the host never overruns stdin.
+# Ctrl-C handling is disabled meanwhile since the data may contain \x03, and
+# a first \x06 tells the host it is safe to start sending.
+WRITER_STUB = """\
+import sys, micropython
+micropython.kbd_intr(-1)
+try:
+    f = open({target!r}, 'wb')
+    sys.stdout.write('\\x06')
+    n = {size}
+    while n:
+        d = sys.stdin.buffer.read(min(n, {chunk}))
+        f.write(d)
+        n -= len(d)
+        sys.stdout.write('\\x06')
+    f.close()
+finally:
+    micropython.kbd_intr(3)
+print('File uploaded successfully!')
+"""
+
+
+def _read_until(ser, sentinel, timeout=5.0):
+    """Read until sentinel arrives; raise TimeoutError if it does not"""
+    # pyserial applies the port timeout to the whole read_until() call
+    if ser.timeout != timeout:
+        ser.timeout = timeout
+    response = ser.read_until(sentinel)
+    if not response.endswith(sentinel):
+        raise TimeoutError(f"No {sentinel!r} from ESP32 within {timeout}s")
+    return response
+
+
+def _raw_exec(ser, command, timeout=5):
+    """Run one command in raw REPL mode and return (output, error)"""
+    ser.write(command.encode('utf-8') + b'\x04')  # Ctrl-D to execute
+    
+    # The reply is OK<output>\x04<error>\x04>
+    response = _read_until(ser, b'\x04>', timeout)
+    if response.startswith(b'OK'):
+        response = response[2:]
+    return _split_reply(response)
+
+
+def _split_reply(response):
+    """Split a raw REPL reply ending in \\x04> into (output, error)"""
+    output, _, error = response[:-2].partition(b'\x04')
+    return output.decode('utf-8', errors='ignore'), error.decode('utf-8', errors='ignore')
+
+
+def _start_exec(ser, command, timeout=5):
+    """Send command with raw-paste flow control and return once it is running"""
+    code = command.encode('utf-8')
+    ser.write(b'\x05A\x01')  # Ask for raw-paste mode
+    reply = ser.read(2)
+    if reply != b'R\x01':
+        # No raw-paste (MicroPython < 1.14): plain raw REPL submission
+        if reply != b'R\x00':
+            # Older firmware echoes the banner instead; read(2) took its first bytes
+            _read_until(ser, RAW_REPL_BANNER[2:], timeout)
+        ser.write(code + b'\x04')  # Ctrl-D to execute
+        _read_until(ser, b'OK', timeout)
+        return
+    
+    # The device grants a window of bytes and sends \x01 to extend it
+    window = int.from_bytes(ser.read(2), 'little')
+    remain = window
+    sent = 0
+    while sent < len(code):
+        while remain == 0 or ser.in_waiting:
+            c = ser.read(1)
+            if c == b'\x01':
+                remain += window
+            elif c == b'\x04':
+                ser.write(b'\x04')  # Device aborted the paste
+                raise RuntimeError("ESP32 rejected the upload stub")
+            else:
+                raise TimeoutError(f"Unexpected {c!r} from ESP32 during raw paste")
+        block = code[sent:sent + remain]
+        ser.write(block)
+        remain -= len(block)
+        sent += len(block)
+    ser.write(b'\x04')  # End of code; the device acknowledges and starts running it
+    _read_until(ser, b'\x04', timeout)
+
+
+def _set_baud(ser, baud):
+    """Switch the ESP32 REPL UART, then the host port, to a new baud rate"""
+    ser.write(f"import machine\nmachine.UART(0, baudrate={baud})\x04".encode('utf-8'))  # Ctrl-D to execute
+    ser.flush()
+    time.sleep(0.1)  # The reply is garbled by the switch; let it drain
+    ser.baudrate = baud
+    ser.reset_input_buffer()
+
+
+def _negotiate_baud(ser, baud):
+    """Try to raise the link to baud; return the rate actually in use"""
+    try:
+        _set_baud(ser, baud)
+        if 'baud ok' in _raw_exec(ser, "print('baud ok')", timeout=1)[0]:
+            return baud
+    except (serial.SerialException, TimeoutError):
+        pass
+    
+    # The board or adapter did not follow; carry on at the REPL default. The
+    # board may have switched even though its reply was lost, so send the
+    # restore at the new rate first, then again at the default to confirm.
+    # Ctrl-C drops any garbled input the raw REPL is still holding.
+    try:
+        ser.baudrate = baud
+        ser.write(b'\x03')
+        _set_baud(ser, REPL_BAUD)
+    except serial.SerialException:
+        ser.baudrate = REPL_BAUD
+    ser.write(b'\x03')
+    ser.reset_input_buffer()
+    _raw_exec(ser, f"import machine\nmachine.UART(0, baudrate={REPL_BAUD})")
+    return REPL_BAUD
+
+
+def upload_file(port, filename, target_name="/main.py", baud=UPLOAD_BAUD):
     """Upload a file to ESP32"""
     print(f"Connecting to {port}...")
     
     try:
-        ser = serial.Serial(port, 115200, timeout=1)
-        time.sleep(2)
+        # Open with DTR/RTS released so the board's auto-reset circuit does not reboot it
+        ser = serial.Serial()
+        ser.port = port
+        ser.baudrate = REPL_BAUD
+        ser.timeout = 5
+        ser.dtr = False
+        ser.rts = False
+        ser.open()
+        # Windows drivers default to small queues that stall large writes;
+        # other platforms have no such knob
+        try:
+            ser.set_buffer_size(rx_size=OS_BUFFER_SIZE, tx_size=OS_BUFFER_SIZE)
+        except AttributeError:
+            pass
         
         print("Connected! Reading file...")
-        with open(filename, 'r', encoding='utf-8') as f:
-            code = f.read()
+        with open(filename, 'rb') as f:
+            data = f.read()
         
         print(f"Uploading {filename} to ESP32 as {target_name}...")
         print("This may take a moment...\n")
         
-        # Enter raw REPL mode
-        ser.write(b'\r\x03\x03')  # Ctrl-C twice
-        time.sleep(0.1)
+        # Stop whatever is running and wait for the raw REPL banner instead of a
+        # fixed delay. The board may already be in raw mode, where Ctrl-C prints
+        # nothing, so only the banner is waited for; anything before it is discarded.
+        ser.write(b'\r\x03')  # Ctrl-C
+        ser.reset_input_buffer()
         ser.write(b'\r\x01')  # Ctrl-A for raw REPL
-        time.sleep(0.5)
+        _read_until(ser, RAW_REPL_BANNER)
         
-        # Clear any output
-        ser.read(ser.in_waiting)
-        
-        # Create file writing command
-        file_cmd = f"""
-f = open('{target_name}', 'w')
-f.write({repr(code)})
-f.close()
-print('File uploaded successfully!')
-"""
+        # Speed up the link for the transfer
+        if baud != REPL_BAUD:
+            baud = _negotiate_baud(ser, baud)
+            print(f"Transferring at {baud} baud")
         
-        # Send command
-        ser.write(file_cmd.encode('utf-8'))
-        ser.write(b'\r\x04')  # Ctrl-D to execute
-        time.sleep(1)
+        # Start the writer stub, then stream the raw file bytes to its stdin.
+        # Nothing is parsed as Python on the ESP32, and it holds one block at a time.
+        _start_exec(ser, WRITER_STUB.format(target=target_name, size=len(data), chunk=CHUNK_SIZE))
+        # Wait for the stub's ready byte; until then Ctrl-C in the data would still
+        # interrupt it. Anything else means it failed and the rest of its reply says why.
+        reply = ser.read(1)
+        if reply == b'\x06':
+            for i in range(0, len(data), CHUNK_SIZE):
+                ser.write(data[i:i + CHUNK_SIZE])
+                reply = ser.read(1)
+                if reply != b'\x06':
+                    # Ctrl-C drops the block the failed stub never read from the raw REPL input
+                    ser.write(b'\x03')
+                    break
+            else:
+                reply = b''
+        output, error = _split_reply(reply + _read_until(ser, b'\x04>'))
+        response = output + error
         
-        # Read response
-        response = ser.read(ser.in_waiting).decode('utf-8', errors='ignore')
+        # Put the REPL back on its default rate for the dashboard
+        if baud != REPL_BAUD:
+            _set_baud(ser, REPL_BAUD)
         
         if 'File uploaded successfully!' in response:
             print("✓ Upload successful!")
             print(f"✓ {filename} uploaded to ESP32 as {target_name}")
             print("\nResetting ESP32...")
             
-            # Soft reset
-            ser.write(b'\r\x03\x03')  # Ctrl-C
-            time.sleep(0.1)
-            ser.write(b'\r\x04')  # Ctrl-D (soft reset)
-            time.sleep(1)
+            # Soft reset from the friendly REPL; main.py is skipped when resetting in raw mode
+            ser.write(b'\x02')  # Ctrl-B to leave raw REPL
+            _read_until(ser, FRIENDLY_PROMPT)
+            ser.write(b'\x04')  # Ctrl-D (soft reset)
+            _read_until(ser, b'soft reboot')
             
             print("✓ ESP32 reset complete!")
             print("\nYour code should now be running on the ESP32.")
@@ -97,7 +249,7 @@ if __name__ == "__main__":
     print("="*50)
     print(f"File to upload: {filename}")
     print(f"Target port: {port}")
-    print(f"Baud rate: 115200")
+    print(f"Baud rate: {REPL_BAUD} (upload at up to {UPLOAD_BAUD})")
     print("="*50 + "\n")
     
     success = upload_file(port, filename)